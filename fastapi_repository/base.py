@@ -1,41 +1,232 @@
-from typing import Optional, List, Union, Dict, Any, Sequence
+import contextlib
+import functools
+import re
+from typing import Optional, List, Union, Dict, Any, Sequence, AsyncIterator, MutableMapping
 from uuid import UUID
-from sqlalchemy import func, update, delete
+from sqlalchemy import event, func, insert, update, delete, bindparam, literal_column, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.future import select
-from sqlalchemy.orm import joinedload, lazyload
+from sqlalchemy.orm import (
+    MANYTOMANY,
+    ONETOMANY,
+    RelationshipProperty,
+    aliased,
+    joinedload,
+    lazyload,
+    selectinload,
+    make_transient_to_detached,
+)
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.util import LRUCache
 
+# Operator token -> (column method, optional format string for the value).
+# Conditions are built as getattr(column, method)(value).
 OPERATORS = {
     # Exact match
-    "exact": lambda col, val: col == val,
-    "iexact": lambda col, val: col.ilike(val),
+    "exact": ("__eq__", None),
+    "iexact": ("ilike", None),
     # Partial match
-    "contains": lambda col, val: col.contains(val),
-    "icontains": lambda col, val: col.ilike(f"%{val}%"),
+    "contains": ("contains", None),
+    "icontains": ("ilike", "%{}%"),
     # IN clause
-    "in": lambda col, val: col.in_(val) if isinstance(val, list) else col.in_([val]),
+    "in": ("in_", None),
     # Comparison operators
-    "gt": lambda col, val: col > val,
-    "gte": lambda col, val: col >= val,
-    "lt": lambda col, val: col < val,
-    "lte": lambda col, val: col <= val,
+    "gt": ("__gt__", None),
+    "gte": ("__ge__", None),
+    "lt": ("__lt__", None),
+    "lte": ("__le__", None),
     # Starts/ends with
-    "startswith": lambda col, val: col.startswith(val),
-    "istartswith": lambda col, val: col.ilike(f"{val}%"),
-    "endswith": lambda col, val: col.endswith(val),
-    "iendswith": lambda col, val: col.ilike(f"%{val}"),
+    "startswith": ("startswith", None),
+    "istartswith": ("ilike", "{}%"),
+    "endswith": ("endswith", None),
+    "iendswith": ("ilike", "%{}"),
 }
 
 
+def _operand(op: str, value):
+    """
+    Convert a search value into the argument of the operator's column method.
+    """
+    method, fmt = OPERATORS[op]
+    if fmt is not None:
+        return fmt.format(value)
+    if method == "in_" and not isinstance(value, list):
+        return [value]
+    return value
+
+
+def _condition(op: str, column, value):
+    """
+    Build the condition for `op` with the value embedded in it.
+    """
+    return getattr(column, OPERATORS[op][0])(_operand(op, value))
+
+
+def _bound_condition(op: str, column, name: str):
+    """
+    Build the condition for `op` against a named placeholder instead of a value.
+    The value to bind is `_operand(op, value)`.
+    """
+    method = OPERATORS[op][0]
+    return getattr(column, method)(bindparam(name, expanding=method == "in_"))
+
+
+def _relationship_condition(rel_attr, column, make_condition, joins: Optional[List]):
+    """
+    Apply `make_condition(column)` on a related column to the model.
+
+    Collections are filtered with EXISTS (`rel.any()`). A many-to-one or
+    one-to-one relationship is added to `joins` with an alias of its target,
+    and filtered on the alias's column, when the caller can join (`joins` is a
+    list); each relationship gets its own alias, so self-referential ones and
+    several relationships to the same table can be combined. Otherwise, e.g.
+    for UPDATE/DELETE, it is filtered with EXISTS (`rel.has()`).
+    """
+    if rel_attr is None:
+        return make_condition(column)
+    if rel_attr.property.uselist:
+        return rel_attr.any(make_condition(column))
+    if joins is None:
+        return rel_attr.has(make_condition(column))
+    for joined, target in joins:
+        if joined is rel_attr:
+            break
+    else:
+        target = aliased(rel_attr.property.mapper.class_)
+        joins.append((rel_attr, target))
+    return make_condition(getattr(target, column.key))
+
+
+def _join_all(query, joins: List):
+    """
+    Join the relationships collected by `_relationship_condition` into a query.
+    """
+    for rel_attr, target in joins:
+        query = query.join(rel_attr.of_type(target))
+    return query
+
+
+_LOADERS = {"joined": joinedload, "lazy": lazyload, "selectin": selectinload}
+
+
+@functools.lru_cache(maxsize=None)
+def _key_pattern(operators: tuple) -> re.Pattern:
+    """
+    Compile the search key grammar `[rel__]field[__op]` for the given operators.
+    The relationship part is optional and lazy, so `field__op` is preferred
+    over `rel__field` when the last part names an operator.
+    """
+    name = r"(?:(?!__)\w)+"
+    ops = "|".join(re.escape(op) for op in operators)
+    return re.compile(
+        rf"(?:(?P<rel>{name})__)??(?P<field>{name})(?:__(?P<op>{ops}))?"
+    )
+
+
+# Statements that manage transactions rather than query data.
+_TRANSACTION_CONTROL = re.compile(
+    r"\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE
+)
+
+
+# Session.info keys: tables written in the open transaction, and `find` cache
+# entries held back until it commits.
+_WRITTEN_TABLES = "fastapi_repository.written_tables"
+_PENDING_CACHE = "fastapi_repository.pending_cache"
+
+
+def _track_writes(session) -> None:
+    """
+    Record which tables `session` writes in its open transaction, and store
+    the `find` cache entries held back in `_PENDING_CACHE` once it commits.
+    If tracking starts mid-transaction, earlier writes are unknown, so every
+    table counts as written ("*") until that transaction ends.
+    """
+    info = session.info
+    if _WRITTEN_TABLES in info:
+        return
+    written = info[_WRITTEN_TABLES] = {"*"} if session.in_transaction() else set()
+    pending = info[_PENDING_CACHE] = []
+
+    @event.listens_for(session, "after_flush")
+    def after_flush(session, flush_context):
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            written.update(table.name for table in inspect(instance).mapper.tables)
+
+    @event.listens_for(session, "do_orm_execute")
+    def do_orm_execute(state):
+        if state.is_insert or state.is_update or state.is_delete:
+            written.add(state.statement.table.name)
+
+    @event.listens_for(session, "after_commit")
+    def after_commit(session):
+        for cache, key, entry in pending:
+            cache[key] = entry
+
+    @event.listens_for(session, "after_transaction_end")
+    def after_transaction_end(session, transaction):
+        if transaction.parent is None:
+            written.clear()
+            pending.clear()
+
+
+def _freeze(specs) -> tuple:
+    """
+    Turn joinedload/lazyload specs into a hashable cache key component.
+    """
+    if not specs:
+        return ()
+    return tuple(tuple(spec) if isinstance(spec, list) else spec for spec in specs)
+
+
 class BaseRepository:
     default_scope: dict = {}
+    # Optional in-process cache for `find(id)` results, e.g. a
+    # cachetools.TTLCache/LRUCache shared by the repositories of one model.
+    cache: Optional[MutableMapping] = None
+    # Per-table counters bumped by every update/destroy, which invalidates all
+    # cached `find` results for that table at once.
+    _cache_versions: Dict[str, int] = {}
+    # Compiled SQL for the statements executed by repositories, sized for many
+    # repositories and call shapes. Keys include the dialect, so it can be
+    # shared across engines. Set to None to use each engine's own cache.
+    compiled_cache: Optional[LRUCache] = LRUCache(4096)
+    # Statement templates shared by every repository, keyed by model and the
+    # shape of the call (filter keys, sorting, loaders). Only the bound
+    # parameter values change between calls that hit the same template.
+    _statement_cache: LRUCache = LRUCache(512)
+    # Search keys resolved once per model:
+    # (model, key) -> (relationship attribute or None, column, operator)
+    _condition_resolver_cache: Dict[tuple, tuple] = {}
+    # Conditions built from a class-level `default_scope`:
+    # (repository class, model) -> list of conditions
+    _default_scope_cache: Dict[tuple, list] = {}
+    # model -> {column attribute name: (asc, desc)}
+    _orderable_columns_cache: Dict[type, Dict[str, tuple]] = {}
 
     def __init__(self, session: AsyncSession, model=None):
         self.session = session
         if not model:
             raise ValueError("Model is not set for this repository.")
         self.model = model
+        # Values generated by the database are only known after a refresh.
+        self._needs_refresh = any(
+            column.server_default is not None
+            or column.server_onupdate is not None
+            or column.computed is not None
+            for column in model.__table__.columns
+        )
+        # The ORM acts on related rows (cascades, nulling child foreign keys,
+        # clearing link tables) only when deletes go through the session.
+        self._deletes_via_session = any(
+            rel.cascade.delete
+            or (rel.direction in (ONETOMANY, MANYTOMANY) and not rel.passive_deletes)
+            for rel in inspect(model).relationships
+        )
+        if self.cache is not None:
+            _track_writes(session.sync_session)
 
     async def find(
         self,
@@ -44,53 +235,188 @@ class BaseRepository:
         sorted_order: str = "asc",
         joinedload_models: Optional[List] = None,
         lazyload_models: Optional[List] = None,
+        selectinload_models: Optional[List] = None,
         disable_default_scope: bool = False,
     ):
         """
         Find a record by its ID. Raise an exception if not found.
+        If `cache` is set, results loaded without loader options are cached.
         """
-        query = await self.__generate_query(
+        cache_key = None
+        if self.cache is not None and not (
+            joinedload_models or lazyload_models or selectinload_models
+        ):
+            _track_writes(self.session.sync_session)
+            cache_key = self.__find_cache_key(id, disable_default_scope)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                version, snapshot = cached
+                if version == self.__cache_version():
+                    return await self.__from_snapshot(snapshot)
+                self.cache.pop(cache_key, None)
+
+        query, params = self.__generate_query(
             limit=1,
             offset=0,
             sorted_by=sorted_by,
             sorted_order=sorted_order,
             joinedload_models=joinedload_models,
             lazyload_models=lazyload_models,
+            selectinload_models=selectinload_models,
             disable_default_scope=disable_default_scope,
             id=id,
         )
 
-        result = await self.session.execute(query)
+        result = await self.session.execute(
+            query, params, execution_options=self._execution_options
+        )
         instance = result.scalars().first()
 
         if not instance:
             raise NoResultFound(f"{self.model.__name__} with id {id} not found.")
 
+        if cache_key is not None:
+            snapshot = self.__snapshot(instance)
+            if snapshot is not None:
+                self.__store_snapshot(cache_key, snapshot)
         return instance
 
+    @property
+    def _execution_options(self) -> Dict[str, Any]:
+        """
+        Execution options passed with every statement the repository runs.
+        """
+        if self.compiled_cache is None:
+            return {}
+        return {"compiled_cache": self.compiled_cache}
+
+    def __find_cache_key(self, id: Union[int, UUID], disable_default_scope: bool) -> tuple:
+        """
+        Cache key for `find(id)`, specific to the scope applied. Entries are
+        stored as (table version, snapshot), so a write to the table supersedes
+        the entry and it is replaced on the next lookup.
+        """
+        scope = None if disable_default_scope else repr(self.default_scope)
+        return (self.model.__tablename__, str(id), scope)
+
+    def __cache_version(self) -> int:
+        """
+        Current invalidation counter of the model's table.
+        """
+        return self._cache_versions.get(self.model.__tablename__, 0)
+
+    def __invalidate_cache(self) -> None:
+        """
+        Invalidate every cached `find` result for the model's table.
+        """
+        table = self.model.__tablename__
+        self._cache_versions[table] = self._cache_versions.get(table, 0) + 1
+
+    def __snapshot(self, instance) -> Optional[Dict[str, Any]]:
+        """
+        Loaded column values of `instance`, or None if some aren't loaded.
+        Caching values rather than the instance keeps cached entries independent
+        of the session that loaded them (commits, rollbacks, expiration).
+        """
+        loaded = inspect(instance).dict
+        snapshot = {}
+        for prop in inspect(self.model).column_attrs:
+            if prop.key not in loaded:
+                return None
+            snapshot[prop.key] = loaded[prop.key]
+        return snapshot
+
+    def __store_snapshot(self, cache_key: tuple, snapshot: Dict[str, Any]) -> None:
+        """
+        Cache a snapshot, or hold it back until commit if the session has written
+        to the table in its open transaction: the values may be rolled back, and
+        other sessions can't see them yet.
+        """
+        entry = (self.__cache_version(), snapshot)
+        info = self.session.sync_session.info
+        if info[_WRITTEN_TABLES] & {self.model.__tablename__, "*"}:
+            info[_PENDING_CACHE].append((self.cache, cache_key, entry))
+        else:
+            self.cache[cache_key] = entry
+
+    async def __from_snapshot(self, snapshot: Dict[str, Any]):
+        """
+        Rebuild an instance from a cached snapshot and attach it to the session
+        without running SQL. An instance already in the session is returned as is.
+        """
+        instance = inspect(self.model).class_manager.new_instance()
+        for key, value in snapshot.items():
+            set_committed_value(instance, key, value)
+        make_transient_to_detached(instance)
+
+        existing = self.session.identity_map.get(inspect(instance).key)
+        if existing is not None:
+            return existing
+        return await self.session.merge(instance, load=False)
+
+    async def find_many(
+        self,
+        ids: Sequence[Union[int, UUID]],
+        joinedload_models: Optional[List] = None,
+        lazyload_models: Optional[List] = None,
+        selectinload_models: Optional[List] = None,
+        disable_default_scope: bool = False,
+    ):
+        """
+        Find records by their IDs in a single query, returned in the order of `ids`.
+        Raise an exception if any of them is not found.
+        """
+        ids = list(ids)
+        if not ids:
+            return []
+
+        query, params = self.__generate_query(
+            limit=None,
+            offset=None,
+            joinedload_models=joinedload_models,
+            lazyload_models=lazyload_models,
+            selectinload_models=selectinload_models,
+            disable_default_scope=disable_default_scope,
+            id__in=ids,
+        )
+        result = await self.session.execute(
+            query, params, execution_options=self._execution_options
+        )
+        instances = {instance.id: instance for instance in result.scalars()}
+
+        missing = [id for id in ids if id not in instances]
+        if missing:
+            raise NoResultFound(f"{self.model.__name__} with ids {missing} not found.")
+
+        return [instances[id] for id in ids]
+
     async def find_by(
         self,
         sorted_by: Optional[str] = None,
         sorted_order: str = "asc",
         joinedload_models: Optional[List] = None,
         lazyload_models: Optional[List] = None,
+        selectinload_models: Optional[List] = None,
         disable_default_scope: bool = False,
         **search_params,
     ):
         """
         Find a record by given attributes. Return None if not found.
         """
-        query = await self.__generate_query(
+        query, params = self.__generate_query(
             limit=1,
             offset=0,
             sorted_by=sorted_by,
             sorted_order=sorted_order,
             joinedload_models=joinedload_models,
             lazyload_models=lazyload_models,
+            selectinload_models=selectinload_models,
             disable_default_scope=disable_default_scope,
             **search_params,
         )
-        result = await self.session.execute(query)
+        result = await self.session.execute(
+            query, params, execution_options=self._execution_options
+        )
         instance = result.scalars().first()
         return instance
 
@@ -100,6 +426,7 @@ class BaseRepository:
         sorted_order: str = "asc",
         joinedload_models: Optional[List] = None,
         lazyload_models: Optional[List] = None,
+        selectinload_models: Optional[List] = None,
         disable_default_scope: bool = False,
         **search_params,
     ):
@@ -111,6 +438,7 @@ class BaseRepository:
             sorted_order=sorted_order,
             joinedload_models=joinedload_models,
             lazyload_models=lazyload_models,
+            selectinload_models=selectinload_models,
             disable_default_scope=disable_default_scope,
             **search_params,
         )
@@ -128,182 +456,440 @@ class BaseRepository:
         sorted_order: str = "asc",
         joinedload_models: Optional[List] = None,
         lazyload_models: Optional[List] = None,
+        selectinload_models: Optional[List] = None,
         disable_default_scope: bool = False,
         **search_params,
     ):
         """
         Find records with optional filtering, sorting, and pagination.
         """
-        query = await self.__generate_query(
+        query, params = self.__generate_query(
+            limit=limit,
+            offset=offset,
+            sorted_by=sorted_by,
+            sorted_order=sorted_order,
+            joinedload_models=joinedload_models,
+            lazyload_models=lazyload_models,
+            selectinload_models=selectinload_models,
+            disable_default_scope=disable_default_scope,
+            **search_params,
+        )
+        result = await self.session.execute(
+            query, params, execution_options=self._execution_options
+        )
+        return result.scalars().all()
+
+    async def iter_where(
+        self,
+        batch_size: int = 1000,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        sorted_by: Optional[str] = None,
+        sorted_order: str = "asc",
+        joinedload_models: Optional[List] = None,
+        lazyload_models: Optional[List] = None,
+        selectinload_models: Optional[List] = None,
+        disable_default_scope: bool = False,
+        **search_params,
+    ) -> AsyncIterator:
+        """
+        Stream records with optional filtering, sorting, and pagination,
+        fetching `batch_size` rows at a time instead of loading them all.
+
+        Usage:
+            async for user in repository.iter_where(is_active=True):
+                ...
+        """
+        query, params = self.__generate_query(
             limit=limit,
             offset=offset,
             sorted_by=sorted_by,
             sorted_order=sorted_order,
             joinedload_models=joinedload_models,
             lazyload_models=lazyload_models,
+            selectinload_models=selectinload_models,
             disable_default_scope=disable_default_scope,
             **search_params,
         )
-        result = await self.session.execute(query)
-        return result.unique().scalars().all()
+        result = await self.session.stream(
+            query.execution_options(yield_per=batch_size),
+            params,
+            execution_options=self._execution_options,
+        )
+        async for instance in result.scalars():
+            yield instance
 
     async def count(self, disable_default_scope: bool = False, **search_params) -> int:
         """
         Count records with optional filtering.
         """
-        conditions = []
+        key = self.__statement_key("count", search_params)
+        query = self._statement_cache.get(key) if key else None
+        if query is None:
+            joins = []
+            conditions = self.__get_search_conditions(key, search_params, joins)
+            query = select(func.count()).select_from(self.model.__table__)
+            query = _join_all(query, joins).where(*conditions)
+            if key:
+                self._statement_cache[key] = query
+        params = self.__get_bound_values(search_params) if key else {}
+
         if not disable_default_scope:
-            default_conditions = await self.__get_conditions(**self.default_scope)
-            if default_conditions:
-                conditions.extend(default_conditions)
+            query = self.__apply_default_scope(query)
 
-        conditions += await self.__get_conditions(**search_params)
-        query = select(func.count("*")).select_from(self.model).where(*conditions)
-        result = await self.session.execute(query)
-        return result.scalar() or 0
+        count = await self.session.scalar(
+            query, params, execution_options=self._execution_options
+        )
+        return count or 0
 
     async def exists(
         self, disable_default_scope: bool = False, **search_params
     ) -> bool:
         """
         Check if any record exists with the given attributes.
+        Stops at the first matching row instead of counting all of them.
         """
-        counted = await self.count(
-            disable_default_scope=disable_default_scope, **search_params
+        key = self.__statement_key("exists", search_params)
+        query = self._statement_cache.get(key) if key else None
+        if query is None:
+            joins = []
+            conditions = self.__get_search_conditions(key, search_params, joins)
+            query = select(literal_column("1")).select_from(self.model)
+            query = _join_all(query, joins).where(*conditions)
+            if key:
+                self._statement_cache[key] = query
+        params = self.__get_bound_values(search_params) if key else {}
+
+        if not disable_default_scope:
+            query = self.__apply_default_scope(query)
+
+        result = await self.session.execute(
+            query.limit(1), params, execution_options=self._execution_options
         )
-        return counted > 0
+        return result.first() is not None
 
-    async def __generate_query(
+    def __generate_query(
         self,
-        limit: int = 100,
-        offset: int = 0,
+        limit: Optional[int] = 100,
+        offset: Optional[int] = 0,
         sorted_by: Optional[str] = None,
         sorted_order: str = "asc",
         joinedload_models: Optional[List] = None,
         lazyload_models: Optional[List] = None,
+        selectinload_models: Optional[List] = None,
         disable_default_scope: bool = False,
         **search_params,
     ):
         """
         Generate a query with optional filtering, sorting, and pagination.
         Apply default scope if not disabled.
+        Returns the query together with the parameter values to execute it with.
         """
-        conditions = []
-        if not disable_default_scope:
-            default_conditions = await self.__get_conditions(**self.default_scope)
-            conditions.extend(default_conditions)
+        key = self.__statement_key(
+            "select",
+            search_params,
+            sorted_by,
+            sorted_order,
+            _freeze(joinedload_models),
+            _freeze(lazyload_models),
+            _freeze(selectinload_models),
+        )
+        query = self._statement_cache.get(key) if key else None
+        if query is None:
+            joins = []
+            conditions = self.__get_search_conditions(key, search_params, joins)
+            query = _join_all(select(self.model), joins).where(*conditions)
+
+            if joinedload_models:
+                for spec in joinedload_models:
+                    query = query.options(self._build_loader_option(spec, loader="joined"))
 
-        conditions += await self.__get_conditions(**search_params)
+            if lazyload_models:
+                for spec in lazyload_models:
+                    query = query.options(self._build_loader_option(spec, loader="lazy"))
+
+            if selectinload_models:
+                for spec in selectinload_models:
+                    query = query.options(
+                        self._build_loader_option(spec, loader="selectin")
+                    )
 
-        query = select(self.model).where(*conditions)
+            if sorted_by:
+                query = self._apply_order_by(query, sorted_by, sorted_order)
+
+            if key:
+                self._statement_cache[key] = query
+        params = self.__get_bound_values(search_params) if key else {}
+
+        if not disable_default_scope:
+            query = self.__apply_default_scope(query)
 
-        if joinedload_models:
-            for spec in joinedload_models:
-                query = query.options(self._build_loader_option(spec, loader="joined"))
+        return query.limit(limit).offset(offset), params
 
-        if lazyload_models:
-            for spec in lazyload_models:
-                query = query.options(self._build_loader_option(spec, loader="lazy"))
+    def __statement_key(self, kind: str, search_params: Dict[str, Any], *shape):
+        """
+        Build the statement cache key for a call, or None if it can't be cached.
+        Values that change the rendered SQL (None becomes IS NULL, SQL expressions
+        are inlined) can't be bound to a placeholder, so those calls skip the cache.
+        So do comparisons against a relationship or a mapped instance, which
+        SQLAlchemy expands into the related key columns.
+        """
+        for name, value in search_params.items():
+            if value is None or isinstance(value, ClauseElement):
+                return None
+            if inspect(value, raiseerr=False) is not None:
+                return None
+            _, column, _ = self.__resolve_key(name)
+            if isinstance(getattr(column, "property", None), RelationshipProperty):
+                return None
+        key = (type(self), self.model, kind, tuple(search_params), *shape)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
-        if sorted_by:
-            query = self._apply_order_by(query, sorted_by, sorted_order)
+    def __get_search_conditions(
+        self, key, search_params: Dict[str, Any], joins: Optional[List] = None
+    ):
+        """
+        Conditions for a statement template when `key` is set, literal ones otherwise.
+        """
+        if key:
+            return self.__get_bound_conditions(search_params, joins)
+        return self.__get_conditions(search_params, joins)
 
-        return query.limit(limit).offset(offset)
+    @property
+    def _orderable_columns(self) -> Dict[str, tuple]:
+        """
+        Column attributes the model can be sorted by, with their ascending and
+        descending expressions: name -> (asc, desc). Built once per model.
+        """
+        columns = self._orderable_columns_cache.get(self.model)
+        if columns is None:
+            columns = {}
+            for prop in inspect(self.model).column_attrs:
+                attr = getattr(self.model, prop.key)
+                columns[prop.key] = (attr.asc(), attr.desc())
+            self._orderable_columns_cache[self.model] = columns
+        return columns
 
     def _apply_order_by(self, query, sorted_by: str, sorted_order: str):
         """
         Helper to apply order_by to a query.
+        Only column attributes of the model are accepted for `sorted_by`.
         """
-        column = getattr(self.model, sorted_by, None)
-        if not column:
+        orderings = self._orderable_columns.get(sorted_by)
+        if orderings is None:
             raise AttributeError(
                 f"{self.model.__name__} has no attribute '{sorted_by}'"
             )
 
-        if sorted_order.lower() == "asc":
-            query = query.order_by(column.asc())
-        else:
-            query = query.order_by(column.desc())
-        return query
+        asc, desc = orderings
+        return query.order_by(asc if sorted_order.lower() == "asc" else desc)
+
+    @property
+    def _default_scope_conditions(self) -> List:
+        """
+        Conditions for `default_scope`, built once per repository class and model.
+        """
+        if "default_scope" in vars(self):
+            return self.__get_conditions(self.default_scope)
 
-    async def __get_conditions(self, **search_params):
+        key = (type(self), self.model)
+        conditions = self._default_scope_cache.get(key)
+        if conditions is None:
+            conditions = self.__get_conditions(self.default_scope)
+            self._default_scope_cache[key] = conditions
+        return conditions
+
+    def __apply_default_scope(self, query):
+        """
+        Add the `default_scope` conditions to a query, if there are any.
+        """
+        conditions = self._default_scope_conditions
+        return query.where(*conditions) if conditions else query
+
+    def __get_conditions(self, search_params: Dict[str, Any], joins: Optional[List] = None):
         """
         Generate conditions for filtering based on provided keyword arguments.
         Supports Ransack-like operators (field__operator=value).
+        The search values are embedded in the conditions.
+        See `_relationship_condition` for `joins`.
         """
         conditions = []
         for key, value in search_params.items():
-            # If "__" is included in the key, split into field name and operator
-            if "__" in key:
-                parts = key.split("__")
-                op = "exact"
-                if parts[-1] in OPERATORS:  # If the last part is an operator, remove it
-                    op = parts.pop()
-
-                # Simple column: foo__icontains=bar
-                if len(parts) == 1:
-                    column = getattr(self.model, parts[0], None)
-                    if column is None:
-                        raise AttributeError(
-                            f"{self.model.__name__} has no attribute '{parts[0]}'"
-                        )
-                    conditions.append(OPERATORS[op](column, value))
-                    continue
-
-                # One-hop relationship: rel__field__op=value
-                rel_attr = getattr(self.model, parts[0], None)
-                if rel_attr is None or not hasattr(rel_attr, "property"):
-                    raise AttributeError(
-                        f"{self.model.__name__} has no relationship '{parts[0]}'"
-                    )
-                target_cls = rel_attr.property.mapper.class_
-                target_column = getattr(target_cls, parts[1], None)
-                if target_column is None:
-                    raise AttributeError(
-                        f"{target_cls.__name__} has no attribute '{parts[1]}'"
-                    )
-                conditions.append(rel_attr.any(OPERATORS[op](target_column, value)))
-                continue
-            else:
-                # If "__" is not included, treat as simple eq (=) comparison
-                column = getattr(self.model, key, None)
-                if column is None:
-                    raise AttributeError(
-                        f"{self.model.__name__} has no attribute '{key}'"
-                    )
-                conditions.append(column == value)
+            rel_attr, column, op = self.__resolve_key(key)
+            make_condition = functools.partial(_condition, op, value=value)
+            conditions.append(_relationship_condition(rel_attr, column, make_condition, joins))
         return conditions
 
-    async def create(self, **create_params):
+    def __get_bound_conditions(
+        self, search_params: Dict[str, Any], joins: Optional[List] = None
+    ):
+        """
+        Conditions with a named placeholder per search key, values bound at execution.
+        See `_relationship_condition` for `joins`.
+        """
+        conditions = []
+        for key in search_params:
+            rel_attr, column, op = self.__resolve_key(key)
+            make_condition = functools.partial(_bound_condition, op, name=f"search__{key}")
+            conditions.append(_relationship_condition(rel_attr, column, make_condition, joins))
+        return conditions
+
+    def __get_bound_values(self, search_params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parameter values for the placeholders built by `__get_bound_conditions`.
+        """
+        return {
+            f"search__{key}": _operand(self.__resolve_key(key)[2], value)
+            for key, value in search_params.items()
+        }
+
+    def __resolve_key(self, key: str):
+        """
+        Resolve a search key into (relationship attribute or None, column, operator).
+        """
+        cache_key = (self.model, key)
+        resolved = self._condition_resolver_cache.get(cache_key)
+        if resolved is None:
+            resolved = self.__parse_key(key)
+            self._condition_resolver_cache[cache_key] = resolved
+        return resolved
+
+    def __parse_key(self, key: str):
+        """
+        Parse a search key against the model's columns and relationships.
+        """
+        match = _key_pattern(tuple(OPERATORS)).fullmatch(key)
+        if match is None:
+            raise AttributeError(f"{self.model.__name__} has no attribute '{key}'")
+        rel, field, op = match.group("rel", "field", "op")
+        op = op or "exact"
+
+        # Simple column: foo=bar, foo__icontains=bar
+        if rel is None:
+            column = getattr(self.model, field, None)
+            if column is None:
+                raise AttributeError(f"{self.model.__name__} has no attribute '{field}'")
+            return None, column, op
+
+        # One-hop relationship: rel__field__op=value
+        rel_attr = getattr(self.model, rel, None)
+        if not isinstance(getattr(rel_attr, "property", None), RelationshipProperty):
+            raise AttributeError(f"{self.model.__name__} has no relationship '{rel}'")
+        target_cls = rel_attr.property.mapper.class_
+        target_column = getattr(target_cls, field, None)
+        if target_column is None:
+            raise AttributeError(f"{target_cls.__name__} has no attribute '{field}'")
+        return rel_attr, target_column, op
+
+    async def create(self, commit: bool = False, **create_params):
         """
         Generic create method that instantiates the model,
         saves it, and returns the new instance.
+        Changes are flushed; pass commit=True to also commit the transaction.
         """
         instance = self.model(**create_params)
         self.session.add(instance)
-        await self.session.commit()
-        await self.session.refresh(instance)
+        await self.__flush_or_commit(commit, instance)
         return instance
 
-    async def update(self, id: Union[int, UUID], **update_params):
+    async def create_many(
+        self, records: Sequence[Dict[str, Any]], commit: bool = False
+    ) -> List:
         """
-        Update a single record by its primary key.
+        Create several records with a single INSERT ... RETURNING
+        and return the new instances in the order of `records`.
+        Changes are flushed; pass commit=True to also commit the transaction.
+
+        Usage:
+            await repository.create_many([{"name": "foo"}, {"name": "bar"}])
+        """
+        records = list(records)
+        if not records:
+            return []
+
+        bind = self.session.get_bind(mapper=self.model)
+        if not bind.dialect.insert_executemany_returning:
+            instances = [self.model(**record) for record in records]
+            self.session.add_all(instances)
+            await self.__flush_or_commit(commit, *instances)
+            return instances
+
+        stmt = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+        result = await self.session.execute(
+            stmt, records, execution_options=self._execution_options
+        )
+        instances = result.scalars().all()
+        if not commit:
+            return instances
+
+        ids = [instance.id for instance in instances]
+        await self.session.commit()
+        if self.session.sync_session.expire_on_commit:
+            # Reload every expired instance with one SELECT ... IN.
+            instances = await self.find_many(ids, disable_default_scope=True)
+        return instances
+
+    async def update(self, id: Union[int, UUID], commit: bool = False, **update_params):
+        """
+        Update a single record by its primary key with UPDATE ... RETURNING.
+        The values are written directly, so `@validates` hooks and mapper
+        update events don't run. Updates that set a relationship or another
+        non-column attribute load the record and set it on the instance instead.
         Raises NoResultFound if the record doesn't exist.
+        Changes are flushed; pass commit=True to also commit the transaction.
 
         Usage:
             await repository.update(some_id, field1='value1', field2='value2')
         """
-        instance = await self.find(id)
-        for field, value in update_params.items():
-            setattr(instance, field, value)
-        await self.session.commit()
-        await self.session.refresh(instance)
+        if not update_params:
+            return await self.find(id)
+
+        self.__invalidate_cache()
+        # Relationships and other non-column attributes can only be set on an instance.
+        columns = inspect(self.model).column_attrs
+        bind = self.session.get_bind(mapper=self.model)
+        if not bind.dialect.update_returning or any(
+            field not in columns for field in update_params
+        ):
+            instance = await self.find(id)
+            for field, value in update_params.items():
+                setattr(instance, field, value)
+            await self.__flush_or_commit(commit, instance)
+            return instance
+
+        conditions = self.__get_conditions({"id": id})
+        conditions += self._default_scope_conditions
+        stmt = (
+            update(self.model)
+            .where(*conditions)
+            .values(**update_params)
+            .returning(self.model)
+            .execution_options(synchronize_session="fetch")
+        )
+        result = await self.session.execute(
+            stmt, execution_options=self._execution_options
+        )
+        instance = result.scalar_one_or_none()
+        if instance is None:
+            raise NoResultFound(f"{self.model.__name__} with id {id} not found.")
+
+        if commit:
+            await self.session.commit()
+            if self.session.sync_session.expire_on_commit:
+                await self.session.refresh(instance)
         return instance
 
-    async def update_all(self, updates: Dict[str, Any], **search_params) -> int:
+    async def update_all(
+        self, updates: Dict[str, Any], commit: bool = False, **search_params
+    ) -> int:
         """
         Update all records that match the given conditions in one query.
         Returns the number of rows that were updated.
+        Pass commit=True to also commit the transaction.
 
         Usage:
             await repository.update_all(
@@ -312,35 +898,144 @@ class BaseRepository:
                 other_field="foo"
             )
         """
-        conditions = await self.__get_conditions(**search_params)
-        stmt = update(self.model).where(*conditions).values(**updates)
-        result = await self.session.execute(stmt)
-        await self.session.commit()
+        self.__invalidate_cache()
+        stmt, params = self.__get_bulk_statement("update", update, search_params)
+        result = await self.session.execute(
+            stmt.values(**updates), params, execution_options=self._execution_options
+        )
+        if commit:
+            await self.session.commit()
         return result.rowcount
 
-    async def destroy(self, id: Union[int, UUID]) -> None:
+    async def destroy(self, id: Union[int, UUID], commit: bool = False) -> None:
         """
-        Destroy (delete) a single record by its primary key.
+        Destroy (delete) a single record by its primary key with DELETE ... RETURNING.
+        Models whose relationships the ORM acts on when deleting (cascades,
+        one-to-many or many-to-many without `passive_deletes`) are loaded and
+        deleted through the session instead.
         Raises NoResultFound if the record doesn't exist.
+        Changes are flushed; pass commit=True to also commit the transaction.
         """
-        instance = await self.find(id)  # Will raise NoResultFound if not found
-        await self.session.delete(instance)
-        await self.session.commit()
+        self.__invalidate_cache()
+        bind = self.session.get_bind(mapper=self.model)
+        if self._deletes_via_session or not bind.dialect.delete_returning:
+            instance = await self.find(id)  # Will raise NoResultFound if not found
+            await self.session.delete(instance)
+            await self.__flush_or_commit(commit)
+            return
+
+        conditions = self.__get_conditions({"id": id})
+        conditions += self._default_scope_conditions
+        stmt = (
+            delete(self.model)
+            .where(*conditions)
+            .returning(self.model.id)
+            .execution_options(synchronize_session="fetch")
+        )
+        result = await self.session.execute(
+            stmt, execution_options=self._execution_options
+        )
+        if result.scalar_one_or_none() is None:
+            raise NoResultFound(f"{self.model.__name__} with id {id} not found.")
+        if commit:
+            await self.session.commit()
 
-    async def destroy_all(self, **search_params) -> int:
+    async def destroy_all(self, commit: bool = False, **search_params) -> int:
         """
         Destroy (delete) all records that match the given conditions in one query.
         Returns the number of rows that were deleted.
+        Pass commit=True to also commit the transaction.
 
         Usage:
             await repository.destroy_all(field1="value1", field2__gte=10)
         """
-        conditions = await self.__get_conditions(**search_params)
-        stmt = delete(self.model).where(*conditions)
-        result = await self.session.execute(stmt)
-        await self.session.commit()
+        self.__invalidate_cache()
+        stmt, params = self.__get_bulk_statement("delete", delete, search_params)
+        result = await self.session.execute(
+            stmt, params, execution_options=self._execution_options
+        )
+        if commit:
+            await self.session.commit()
         return result.rowcount
 
+    @contextlib.asynccontextmanager
+    async def assert_query_count(self, max_n: int):
+        """
+        Count the SQL statements sent to the database inside the block and raise
+        AssertionError on exit if there were more than `max_n`. Meant for tests,
+        to catch N+1 queries. Yields the list of executed statements.
+        Only statements run on this session's connections are counted, not
+        those of other sessions sharing the engine. Transaction control
+        (BEGIN, SAVEPOINT, ...) isn't counted.
+
+        Usage:
+            async with repository.assert_query_count(2):
+                users = await repository.where(selectinload_models=["posts"])
+        """
+        statements: List[str] = []
+        connections = set()
+        if self.session.in_transaction():
+            connection = await self.session.connection(bind_arguments={"mapper": self.model})
+            connections.add(connection.sync_connection)
+
+        def track_connection(session, transaction, connection):
+            connections.add(connection)
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            if conn in connections and not _TRANSACTION_CONTROL.match(statement):
+                statements.append(statement)
+
+        bind = self.session.get_bind(mapper=self.model)
+        event.listen(self.session.sync_session, "after_begin", track_connection)
+        event.listen(bind, "before_cursor_execute", count_statement)
+        try:
+            yield statements
+        finally:
+            event.remove(bind, "before_cursor_execute", count_statement)
+            event.remove(self.session.sync_session, "after_begin", track_connection)
+
+        if len(statements) > max_n:
+            raise AssertionError(
+                f"Expected at most {max_n} queries, {len(statements)} were executed:\n"
+                + "\n".join(statements)
+            )
+
+    async def __flush_or_commit(self, commit: bool, *instances) -> None:
+        """
+        Flush pending changes, or commit them if `commit` is set, then reload
+        `instances` when they would otherwise hold unloaded attributes.
+        """
+        if commit:
+            await self.session.commit()
+        else:
+            await self.session.flush()
+
+        expired = commit and self.session.sync_session.expire_on_commit
+        if self._needs_refresh or expired:
+            for instance in instances:
+                await self.session.refresh(instance)
+
+    def __get_bulk_statement(self, kind: str, construct, search_params: Dict[str, Any]):
+        """
+        Return the cached UPDATE/DELETE template filtered by `search_params`
+        together with its parameter values.
+        The session isn't synchronized (no evaluation or pre-flight SELECT of
+        the affected rows): instances already loaded keep their old values.
+        """
+        key = self.__statement_key(kind, search_params)
+        stmt = self._statement_cache.get(key) if key else None
+        if stmt is None:
+            conditions = self.__get_search_conditions(key, search_params)
+            stmt = (
+                construct(self.model)
+                .where(*conditions)
+                .execution_options(synchronize_session=False)
+            )
+            if key:
+                self._statement_cache[key] = stmt
+        params = self.__get_bound_values(search_params) if key else {}
+        return stmt, params
+
     def _resolve_attr_chain(self, start_cls, names: Sequence[str]):
         """
         Example: names = ["orders", "items", "product"]
@@ -356,58 +1051,60 @@ class BaseRepository:
             current_cls = attr.property.mapper.class_
         return attrs
 
-    def _build_loader_option(self, item, loader: str = "joined"):
+    def _resolve_loader_spec(self, item) -> List:
         """
         `item` accepts any of the following:
           - String path: "orders__items__product"
           - Array/tuple of strings: ["orders", "items", "product"]
           - Single InstrumentedAttribute
           - Array/tuple of InstrumentedAttributes (multi-level)
-        loader: "joined" | "lazy"
+        Return the chain of InstrumentedAttributes it refers to.
         """
-        if loader not in {"joined", "lazy"}:
-            raise ValueError("loader must be 'joined' or 'lazy'")
-
-        def first_loader(attr):
-            return joinedload(attr) if loader == "joined" else lazyload(attr)
-
-        def chain_loader(opt, attr):
-            return opt.joinedload(attr) if loader == "joined" else opt.lazyload(attr)
-
         # String ("rel__rel2__rel3")
         if isinstance(item, str):
             parts = [p for p in item.split("__") if p]
             if not parts:
                 raise ValueError("empty relationship path")
-            attrs = self._resolve_attr_chain(self.model, parts)
-            opt = first_loader(attrs[0])
-            for a in attrs[1:]:
-                opt = chain_loader(opt, a)
-            return opt
+            return self._resolve_attr_chain(self.model, parts)
 
         # Sequence of strings (["rel", "rel2", ...])
         if isinstance(item, (list, tuple)) and all(isinstance(p, str) for p in item):
-            attrs = self._resolve_attr_chain(self.model, item)
-            opt = first_loader(attrs[0])
-            for a in attrs[1:]:
-                opt = chain_loader(opt, a)
-            return opt
+            if not item:
+                raise ValueError("empty relationship path")
+            return self._resolve_attr_chain(self.model, item)
 
         # Single InstrumentedAttribute
         if hasattr(item, "property"):
-            return first_loader(item)
+            return [item]
 
         # Sequence of InstrumentedAttributes
         if isinstance(item, (list, tuple)) and all(hasattr(p, "property") for p in item):
-            if not item:
-                raise ValueError("empty attribute chain")
-            opt = first_loader(item[0])
-            for a in item[1:]:
-                opt = chain_loader(opt, a)
-            return opt
+            return list(item)
 
         raise TypeError(
-            "joinedload_models/lazyload_models item must be a relationship attribute, "
-            "a list/tuple of relationship attributes, a string path 'a__b__c', "
+            "joinedload_models/lazyload_models/selectinload_models item must be "
+            "a relationship attribute, a list/tuple of relationship attributes, a string path 'a__b__c', "
             "or a list/tuple of strings ['a','b','c']."
-        )
\ No newline at end of file
+        )
+
+    def _build_loader_option(self, item, loader: str = "joined"):
+        """
+        Build a loader option for `item` (see `_resolve_loader_spec`).
+        loader: "joined" | "lazy" | "selectin"
+
+        "joined" only joins many-to-one/one-to-one hops. Collections are loaded
+        with selectinload instead, since a JOIN repeats the parent row per child.
+        """
+        if loader not in _LOADERS:
+            raise ValueError("loader must be 'joined', 'lazy' or 'selectin'")
+
+        opt = None
+        for attr in self._resolve_loader_spec(item):
+            strategy = loader
+            if loader == "joined" and attr.property.uselist:
+                strategy = "selectin"
+            if opt is None:
+                opt = _LOADERS[strategy](attr)
+            else:
+                opt = getattr(opt, f"{strategy}load")(attr)
+        return opt
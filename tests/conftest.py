@@ -1,9 +1,8 @@
 import pytest
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import Column, Integer, String, Uuid, Boolean, SmallInteger
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import event, Column, Integer, String, Uuid, Boolean, SmallInteger, ForeignKey
+from sqlalchemy.orm import declarative_base, relationship
 from uuid import uuid4
 from fastapi_repository import BaseRepository
 from faker import Faker
@@ -20,11 +19,31 @@ class User(Base):
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
     failed_attempts = Column(SmallInteger, default=0)
+    posts = relationship("Post", back_populates="user")
+
+
+class Post(Base):
+    __tablename__ = "posts"
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    user_id = Column(Uuid, ForeignKey("users.id"))
+    user = relationship("User", back_populates="posts")
 
 
 @pytest.fixture(scope="session")
 def engine():
-    return create_async_engine("sqlite+aiosqlite:///:memory:")
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+
+    # Let SQLAlchemy, not the sqlite3 driver, emit BEGIN so SAVEPOINTs work.
+    @event.listens_for(engine.sync_engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def do_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return engine
 
 @pytest_asyncio.fixture(scope="session")
 async def tables(engine):
@@ -36,19 +55,32 @@ async def tables(engine):
 
 @pytest_asyncio.fixture
 async def db_session(engine, tables):
-    async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    async with async_session() as session:
+    # Every test runs inside a transaction that is rolled back afterwards;
+    # commits made by the test only release a SAVEPOINT.
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        session = AsyncSession(
+            bind=conn,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
         yield session
         await session.close()
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.drop_all)
-            await conn.run_sync(Base.metadata.create_all)
+        await trans.rollback()
 
 
 @pytest_asyncio.fixture
 async def user_repository(db_session):
     return BaseRepository(db_session, model=User)
 
+@pytest.fixture
+def assert_query_count(user_repository):
+    return user_repository.assert_query_count
+
+@pytest_asyncio.fixture
+async def post_repository(db_session):
+    return BaseRepository(db_session, model=Post)
+
 @pytest_asyncio.fixture
 async def user(db_session):
     user = User(name="Test User", age=30, email=fake.email(), hashed_password="password", is_active=True)
@@ -57,8 +89,12 @@ async def user(db_session):
     return user
 
 @pytest_asyncio.fixture
-async def users(db_session):
-    users = [User(name=fake.name(), age=fake.random_int(min=18, max=80), email=fake.email(), hashed_password="password", is_active=True) for _ in range(10)]
-    db_session.add_all(users)
+async def users(user_repository):
+    return await user_repository.create_many([dict(name=fake.name(), age=fake.random_int(min=18, max=80), email=fake.email(), hashed_password="password", is_active=True) for _ in range(10)])
+
+@pytest_asyncio.fixture
+async def posts(db_session, user):
+    posts = [Post(title=fake.sentence(), user=user) for _ in range(3)]
+    db_session.add_all(posts)
     await db_session.commit()
-    return users
+    return posts
@@ -1,7 +1,11 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, select
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import declarative_base, relationship
 import pytest
 from uuid import uuid4
 from faker import Faker
+from fastapi_repository import BaseRepository, OPERATORS
 
 fake = Faker()
 
@@ -288,6 +292,13 @@ async def test_update_user(user_repository, user):
     assert found_user.email == new_email
 
 
+@pytest.mark.asyncio
+async def test_update_relationship(post_repository, users, posts):
+    post = await post_repository.update(posts[0].id, user=users[0])
+    assert post.user_id == users[0].id
+    assert await post_repository.count(user_id=users[0].id) == 1
+
+
 @pytest.mark.asyncio
 async def test_update_user_not_found(user_repository):
     non_existent_id = uuid4()
@@ -300,9 +311,8 @@ async def test_update_all_no_conditions(user_repository, users, user):
     updated_count = await user_repository.update_all({"failed_attempts": 2})
     assert updated_count == len(users) + 1
 
-    # Confirm all users have the new value
-    for u in await user_repository.where():
-        assert u.failed_attempts == 2
+    # Confirm all users have the new value in the database
+    assert await user_repository.count(failed_attempts=2) == len(users) + 1
 
 
 @pytest.mark.asyncio
@@ -334,3 +344,500 @@ async def test_update_all_no_match(user_repository):
         {"failed_attempts": 4}, failed_attempts=5
     )
     assert updated_count == 0
+
+
+@pytest.mark.asyncio
+async def test_where_reuses_cached_statement(user_repository, users):
+    first = await user_repository.where(email__icontains=users[0].email.upper())
+    cache_size = len(user_repository._statement_cache)
+
+    second = await user_repository.where(email__icontains=users[1].email.upper())
+    assert len(user_repository._statement_cache) == cache_size
+    assert [u.id for u in first] == [users[0].id]
+    assert [u.id for u in second] == [users[1].id]
+
+
+@pytest.mark.asyncio
+async def test_find_by_none_value(user_repository, user):
+    nameless = await user_repository.create(email=fake.email(), hashed_password="password")
+
+    found_user = await user_repository.find_by(name=None)
+    assert found_user.id == nameless.id
+    assert await user_repository.count(name=None) == 1
+
+
+@pytest.mark.asyncio
+async def test_where_in_single_value(user_repository, user):
+    found_users = await user_repository.where(email__in=user.email)
+    assert [u.id for u in found_users] == [user.id]
+
+
+@pytest.mark.asyncio
+async def test_condition_resolver_is_cached(user_repository, user):
+    await user_repository.where(email__istartswith=user.email[:3])
+    model = user_repository.model
+    resolved = user_repository._condition_resolver_cache[(model, "email__istartswith")]
+    assert resolved[1] is model.email
+    assert resolved[2] == "istartswith"
+
+
+@pytest.mark.asyncio
+async def test_exists_with_multiple_matches(user_repository, users):
+    assert await user_repository.exists(is_active=True) is True
+    assert await user_repository.exists(is_active=False) is False
+
+
+@pytest.mark.asyncio
+async def test_find_many_preserves_order(user_repository, users):
+    ids = [users[3].id, users[0].id, users[7].id, users[0].id]
+    found_users = await user_repository.find_many(ids)
+    assert [u.id for u in found_users] == ids
+
+
+@pytest.mark.asyncio
+async def test_find_many_empty(user_repository):
+    assert await user_repository.find_many([]) == []
+
+
+@pytest.mark.asyncio
+async def test_find_many_not_found(user_repository, user):
+    with pytest.raises(NoResultFound):
+        await user_repository.find_many([user.id, uuid4()])
+
+
+@pytest.mark.asyncio
+async def test_iter_where(user_repository, users):
+    streamed = [u async for u in user_repository.iter_where(batch_size=3, sorted_by="email")]
+    assert [u.id for u in streamed] == [u.id for u in sorted(users, key=lambda u: u.email)]
+
+
+@pytest.mark.asyncio
+async def test_iter_where_with_filter(user_repository, users):
+    streamed = [u async for u in user_repository.iter_where(email=users[2].email)]
+    assert [u.id for u in streamed] == [users[2].id]
+
+
+@pytest.mark.asyncio
+async def test_where_joinedload_collection(user_repository, users, user, posts):
+    found_users = await user_repository.where(joinedload_models=["posts"])
+    assert len(found_users) == len(users) + 1
+    loaded = next(u for u in found_users if u.id == user.id)
+    assert sorted(p.id for p in loaded.posts) == sorted(p.id for p in posts)
+
+
+@pytest.mark.asyncio
+async def test_where_joinedload_many_to_one(post_repository, user, posts):
+    found_posts = await post_repository.where(joinedload_models=["user"])
+    assert len(found_posts) == len(posts)
+    assert all(p.user.id == user.id for p in found_posts)
+
+
+@pytest.mark.asyncio
+async def test_where_selectinload(user_repository, user, posts):
+    found_user = await user_repository.find(user.id, selectinload_models=["posts"])
+    assert len(found_user.posts) == len(posts)
+
+
+@pytest.mark.asyncio
+async def test_update_user_outside_default_scope(db_session, user_repository, user):
+    class InactiveUserRepository(type(user_repository)):
+        default_scope = {"is_active": False}
+
+    repository = InactiveUserRepository(db_session, model=user_repository.model)
+    with pytest.raises(NoResultFound):
+        await repository.update(user.id, email="scoped@example.com")
+    with pytest.raises(NoResultFound):
+        await repository.destroy(user.id)
+    assert (await user_repository.find(user.id)).email == user.email
+
+
+@pytest.mark.asyncio
+async def test_destroy_user_removes_from_session(db_session, user_repository, user):
+    await user_repository.destroy(user.id)
+    assert user not in db_session
+
+
+@pytest.mark.asyncio
+async def test_destroy_user_with_posts(post_repository, user_repository, user, posts):
+    await user_repository.destroy(user.id)
+    assert await post_repository.count(user_id=None) == len(posts)
+
+
+@pytest.mark.asyncio
+async def test_destroy_runs_orm_cascades(db_session):
+    Base = declarative_base()
+
+    class Author(Base):
+        __tablename__ = "authors"
+        id = Column(Integer, primary_key=True)
+        books = relationship("Book", cascade="all, delete-orphan")
+
+    class Book(Base):
+        __tablename__ = "books"
+        id = Column(Integer, primary_key=True)
+        author_id = Column(Integer, ForeignKey("authors.id"))
+
+    await db_session.run_sync(lambda s: Base.metadata.create_all(s.connection()))
+    author_repository = BaseRepository(db_session, model=Author)
+    book_repository = BaseRepository(db_session, model=Book)
+    assert author_repository._deletes_via_session is True
+    assert book_repository._deletes_via_session is False
+
+    author = await author_repository.create()
+    await book_repository.create_many([{"author_id": author.id}] * 2)
+    await author_repository.destroy(author.id)
+    assert await book_repository.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_write_with_per_model_binds(db_session, user_repository, post_repository, user):
+    session = AsyncSession(
+        binds={
+            user_repository.model: db_session.bind,
+            post_repository.model: db_session.bind,
+        },
+        join_transaction_mode="create_savepoint",
+    )
+    repository = BaseRepository(session, model=user_repository.model)
+
+    await repository.create_many([{"email": fake.email()}])
+    updated = await repository.update(user.id, name="Bound")
+    assert updated.name == "Bound"
+    await repository.destroy(user.id)
+    async with repository.assert_query_count(1):
+        assert await repository.count(id=user.id) == 0
+    await session.close()
+
+
+@pytest.mark.asyncio
+async def test_create_user_applies_client_defaults(user_repository):
+    assert user_repository._needs_refresh is False
+
+    new_user = await user_repository.create(email=fake.email())
+    assert new_user.id is not None
+    assert new_user.is_active is True
+    assert new_user.failed_attempts == 0
+
+
+@pytest.mark.asyncio
+async def test_create_many(user_repository):
+    records = [{"email": fake.email(), "name": f"user {i}"} for i in range(5)]
+    created = await user_repository.create_many(records)
+
+    assert [u.email for u in created] == [r["email"] for r in records]
+    assert all(u.id is not None and u.is_active is True for u in created)
+    assert await user_repository.count() == len(records)
+
+
+@pytest.mark.asyncio
+async def test_create_many_empty(user_repository):
+    assert await user_repository.create_many([]) == []
+
+
+@pytest.mark.asyncio
+async def test_create_user_without_commit_is_rolled_back(db_session, user_repository):
+    await user_repository.create(email=fake.email())
+    assert await user_repository.count() == 1
+
+    await db_session.rollback()
+    assert await user_repository.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_create_user_with_commit(db_session, user_repository):
+    await user_repository.create(email=fake.email(), commit=True)
+
+    await db_session.rollback()
+    assert await user_repository.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_default_scope(db_session, user_repository, users):
+    class InactiveUserRepository(type(user_repository)):
+        default_scope = {"is_active": False}
+
+    inactive = await user_repository.create(email=fake.email(), is_active=False)
+    repository = InactiveUserRepository(db_session, model=user_repository.model)
+
+    assert [u.id for u in await repository.where()] == [inactive.id]
+    assert await repository.count() == 1
+    assert await repository.exists(email=users[0].email) is False
+    assert await repository.count(disable_default_scope=True) == len(users) + 1
+    assert (InactiveUserRepository, user_repository.model) in repository._default_scope_cache
+
+
+@pytest.mark.asyncio
+async def test_where_relationship_filter(user_repository, users, user, posts):
+    found_users = await user_repository.where(posts__title=posts[0].title)
+    assert [u.id for u in found_users] == [user.id]
+
+    found_users = await user_repository.where(posts__title__icontains=posts[1].title.upper())
+    assert [u.id for u in found_users] == [user.id]
+
+
+@pytest.mark.asyncio
+async def test_where_related_instance(post_repository, users, user, posts):
+    found_posts = await post_repository.where(user=user)
+    assert sorted(p.id for p in found_posts) == sorted(p.id for p in posts)
+    assert await post_repository.count(user=user) == len(posts)
+    assert await post_repository.count(user=users[0]) == 0
+    assert await post_repository.exists(user=user) is True
+
+
+@pytest.mark.asyncio
+async def test_where_invalid_key(user_repository):
+    with pytest.raises(AttributeError, match="User has no attribute 'email__foo__bar'"):
+        await user_repository.where(email__foo__bar="value")
+
+
+@pytest.mark.asyncio
+async def test_where_repository_sorted_by_relationship_error(user_repository):
+    with pytest.raises(AttributeError, match="User has no attribute 'posts'"):
+        await user_repository.where(sorted_by="posts")
+
+
+@pytest.mark.asyncio
+async def test_find_user_cached(db_session, user_repository, user):
+    await db_session.commit()
+    user_repository.cache = {}
+    found_user = await user_repository.find(user.id)
+    assert len(user_repository.cache) == 1
+
+    cached_user = await user_repository.find(user.id)
+    assert cached_user is found_user
+
+
+@pytest.mark.asyncio
+async def test_find_user_cache_invalidated_by_update(db_session, user_repository, user):
+    await db_session.commit()
+    user_repository.cache = {}
+    await user_repository.find(user.id)
+
+    await user_repository.update(user.id, email="cached@example.com")
+    found_user = await user_repository.find(user.id)
+    assert found_user.email == "cached@example.com"
+    assert len(user_repository.cache) == 0
+
+    await db_session.commit()
+    assert len(user_repository.cache) == 1
+    assert (await user_repository.find(user.id)).email == "cached@example.com"
+
+
+@pytest.mark.asyncio
+async def test_find_user_cache_skips_rolled_back_writes(db_session, user_repository, user):
+    await db_session.commit()
+    user_id, name = user.id, user.name
+    user_repository.cache = {}
+    await user_repository.update(user.id, name="Uncommitted")
+    await user_repository.find(user.id)
+    created = await user_repository.create(email=fake.email())
+    await user_repository.find(created.id)
+    assert user_repository.cache == {}
+
+    await db_session.rollback()
+    assert user_repository.cache == {}
+    assert (await user_repository.find(user_id)).name == name
+
+
+@pytest.mark.asyncio
+async def test_find_user_cache_respects_default_scope(db_session, user_repository, user):
+    class InactiveUserRepository(type(user_repository)):
+        cache = {}
+        default_scope = {"is_active": False}
+
+    repository = InactiveUserRepository(db_session, model=user_repository.model)
+    await repository.find(user.id, disable_default_scope=True)
+    with pytest.raises(NoResultFound):
+        await repository.find(user.id)
+
+
+@pytest.mark.asyncio
+async def test_where_many_to_one_filter(post_repository, user, posts):
+    found_posts = await post_repository.where(
+        user__email=user.email, user__name__icontains="test", sorted_by="id"
+    )
+    assert [p.id for p in found_posts] == sorted(p.id for p in posts)
+    assert await post_repository.count(user__email=user.email) == len(posts)
+    assert await post_repository.exists(user__email=fake.email()) is False
+
+
+@pytest.mark.asyncio
+async def test_where_many_to_one_filter_same_target(db_session):
+    Base = declarative_base()
+
+    class Employee(Base):
+        __tablename__ = "employees"
+        id = Column(Integer, primary_key=True)
+        name = Column(String)
+        manager_id = Column(Integer, ForeignKey("employees.id"))
+        mentor_id = Column(Integer, ForeignKey("employees.id"))
+        manager = relationship("Employee", remote_side=[id], foreign_keys=[manager_id])
+        mentor = relationship("Employee", remote_side=[id], foreign_keys=[mentor_id])
+
+    await db_session.run_sync(lambda s: Base.metadata.create_all(s.connection()))
+    repository = BaseRepository(db_session, model=Employee)
+    boss, coach = await repository.create_many([{"name": "boss"}, {"name": "coach"}])
+    employee, _ = await repository.create_many([
+        {"name": "employee", "manager_id": boss.id, "mentor_id": coach.id},
+        {"name": "other", "manager_id": coach.id, "mentor_id": boss.id},
+    ])
+
+    found = await repository.where(manager__name="boss", mentor__name="coach")
+    assert [e.id for e in found] == [employee.id]
+    assert await repository.count(manager__name="boss") == 1
+    assert await repository.update_all({"name": "renamed"}, manager__name="boss") == 1
+
+
+@pytest.mark.asyncio
+async def test_update_all_many_to_one_filter(post_repository, user, posts):
+    updated_count = await post_repository.update_all(
+        {"title": "renamed"}, user__email=user.email
+    )
+    assert updated_count == len(posts)
+    assert await post_repository.count(title="renamed") == len(posts)
+
+    assert await post_repository.destroy_all(user__email=user.email) == len(posts)
+
+
+@pytest.mark.asyncio
+async def test_where_custom_operator(monkeypatch, user_repository, users):
+    monkeypatch.setitem(OPERATORS, "ne", ("__ne__", None))
+    # Keys resolved with "ne" must not outlive the operator.
+    monkeypatch.setattr(BaseRepository, "_condition_resolver_cache", {})
+    found_users = await user_repository.where(email__ne=users[0].email)
+    assert len(found_users) == len(users) - 1
+    assert users[0].id not in {u.id for u in found_users}
+
+
+@pytest.mark.asyncio
+async def test_where_removed_custom_operator(user_repository):
+    with pytest.raises(AttributeError, match="User has no relationship 'email'"):
+        await user_repository.where(email__ne="value")
+
+
+@pytest.mark.asyncio
+async def test_compiled_cache_is_used(user_repository, user):
+    compiled_cache = user_repository.compiled_cache
+    compiled_cache.clear()
+
+    await user_repository.find_by(email=user.email)
+    assert len(compiled_cache) == 1
+
+    await user_repository.find_by(email=fake.email())
+    assert len(compiled_cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_query_counts(assert_query_count, user_repository, users, user, posts):
+    async with assert_query_count(1):
+        await user_repository.find(user.id)
+    async with assert_query_count(1):
+        await user_repository.find_many([u.id for u in users])
+    async with assert_query_count(1):
+        await user_repository.exists(email=user.email)
+    async with assert_query_count(1):
+        await user_repository.update(user.id, name="Renamed")
+    async with assert_query_count(2):
+        await user_repository.where(selectinload_models=["posts"])
+
+
+@pytest.mark.asyncio
+async def test_assert_query_count_exceeded(assert_query_count, user_repository, users):
+    with pytest.raises(AssertionError, match="Expected at most 1 queries, 2 were executed"):
+        async with assert_query_count(1):
+            for u in users[:2]:
+                await user_repository.find(u.id)
+
+
+@pytest.mark.asyncio
+async def test_assert_query_count_ignores_other_sessions():
+    Base = declarative_base()
+
+    class Tag(Base):
+        __tablename__ = "tags"
+        id = Column(Integer, primary_key=True)
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine) as session, AsyncSession(engine) as other:
+        repository = BaseRepository(session, model=Tag)
+        async with repository.assert_query_count(1) as statements:
+            await other.execute(select(Tag))
+            await other.rollback()
+            await repository.count()
+        assert len(statements) == 1
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_update_all_single_query(assert_query_count, user_repository, users):
+    async with assert_query_count(1):
+        await user_repository.update_all({"age": 42}, is_active=True)
+    async with assert_query_count(1):
+        await user_repository.destroy_all(age__lt=42)
+
+    assert await user_repository.count() == await user_repository.count(age=42)
+
+
+@pytest.mark.asyncio
+async def test_update_all_leaves_loaded_instances_untouched(user_repository, users):
+    other = users[1]
+    other.name = "changed"
+
+    await user_repository.update_all({"age": 5}, email=users[0].email)
+
+    # Loaded instances are not synchronized, but stay usable and keep pending changes
+    assert users[0].age != 5
+    assert other.name == "changed"
+    assert await user_repository.count(name="changed") == 1
+    assert await user_repository.count(age=5, email=users[0].email) == 1
+
+
+def _expiring_session(db_session):
+    return AsyncSession(
+        bind=db_session.bind,
+        expire_on_commit=True,
+        join_transaction_mode="create_savepoint",
+    )
+
+
+@pytest.mark.asyncio
+async def test_find_user_cached_across_expiring_sessions(db_session, user_repository, user):
+    cache = {}
+    model = user_repository.model
+
+    async with _expiring_session(db_session) as first:
+        repository = type(user_repository)(first, model=model)
+        repository.cache = cache
+        await repository.find(user.id)
+        await first.commit()
+
+    async with _expiring_session(db_session) as second:
+        repository = type(user_repository)(second, model=model)
+        repository.cache = cache
+        async with repository.assert_query_count(0):
+            found_user = await repository.find(user.id)
+            assert found_user.email == user.email
+            assert found_user in second
+
+
+@pytest.mark.asyncio
+async def test_find_user_cached_after_rollback(db_session, user_repository, user):
+    cache = {}
+    model = user_repository.model
+
+    async with _expiring_session(db_session) as first:
+        repository = type(user_repository)(first, model=model)
+        repository.cache = cache
+        found_user = await repository.find(user.id)
+        found_user.name = "Not Saved"
+        await first.flush()
+        await first.rollback()
+
+    async with _expiring_session(db_session) as second:
+        repository = type(user_repository)(second, model=model)
+        repository.cache = cache
+        found_user = await repository.find(user.id)
+        assert found_user.name == user.name